@@ -1,23 +1,63 @@
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./bot_gpt.db"
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./bot_gpt.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},  # needed for SQLite + FastAPI
-)
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL + relaxed fsync: readers don't block the writer, commits are cheaper."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")  # ~64 MB page cache
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    cursor.close()
+
+
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """FastAPI dependency to get a DB session per request."""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def upgrade_schema(conn):
+    """
+    Add columns and indexes introduced after an existing bot_gpt.db was created.
+    create_all() only creates missing tables, so new columns on existing
+    tables are added here with ALTER TABLE (NOT NULL ones need a server_default).
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+            default = column.server_default
+            if default is not None and isinstance(default.arg, str):
+                ddl += f" DEFAULT '{default.arg}'"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def init_db():
+    """Create missing tables and columns (run once at startup)."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
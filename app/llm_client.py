@@ -1,19 +1,42 @@
 
+import asyncio
 import os
 from typing import List, Literal
 
+from aiolimiter import AsyncLimiter
 from dotenv import load_dotenv
-import requests
+import httpx
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 print("GROQ_API_KEY:", GROQ_API_KEY)
+# Groq requests-per-minute quota; calls are paced to stay under it
+GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+MAX_CONCURRENT_LLM_CALLS = 20
+
 # type alias
 Role = Literal["system", "user", "assistant"]
 
+# Shared client: keeps TLS connections to Groq alive across requests.
+# Closed on app shutdown (see main.py).
+_client = httpx.AsyncClient(
+    http2=True,
+    headers={
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    },
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+)
+
+# Shared across all requests: the token bucket waits for quota up front
+# instead of letting calls fail with 429s, the semaphore caps in-flight calls.
+_bucket = AsyncLimiter(max_rate=GROQ_RPM, time_period=60)
+_sem = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+
 
-def call_llm(messages: List[dict]) -> str:
+async def call_llm(messages: List[dict]) -> str:
     """
     Call an LLM (Groq Llama3 here) with a list of messages:
     messages = [{ "role": "user"|"assistant"|"system", "content": "..." }, ...]
@@ -32,13 +55,8 @@ def call_llm(messages: List[dict]) -> str:
     "temperature": 0.7,
 }
 
-
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    response = requests.post(url, json=payload, headers=headers, timeout=30)
+    async with _bucket, _sem:
+        response = await _client.post(url, json=payload)
 
     if response.status_code != 200:
         # simple error handling
@@ -46,3 +64,8 @@ def call_llm(messages: List[dict]) -> str:
 
     data = response.json()
     return data["choices"][0]["message"]["content"]
+
+
+async def close_llm_client() -> None:
+    """Close the shared HTTP client (called on app shutdown)."""
+    await _client.aclose()
@@ -1,16 +1,28 @@
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from .database import Base, engine
+from .database import engine, init_db
+from .llm_client import close_llm_client
 from .routers import conversations
 
-# Create DB tables
-Base.metadata.create_all(bind=engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create DB tables
+    await init_db()
+    yield
+    conversations.shutdown_extract_pool()
+    await close_llm_client()
+    await engine.dispose()
+
 
 app = FastAPI(
     title="BOT GPT Backend",
     version="1.0.0",
     description="Backend for BOT GPT conversational platform (case study).",
+    lifespan=lifespan,
 )
 
 
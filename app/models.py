@@ -1,7 +1,7 @@
 # app/models.py
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -32,7 +32,7 @@ class Conversation(Base):
         "Message",
         back_populates="conversation",
         cascade="all, delete-orphan",
-        order_by="Message.created_at",
+        order_by="[Message.created_at, Message.id]",
     )
 
     documents = relationship(
@@ -41,6 +41,11 @@ class Conversation(Base):
         cascade="all, delete-orphan",
     )
 
+    # Backs list_conversations (by user, newest first)
+    __table_args__ = (
+        Index("conversations_user_ctime_idx", user_id, created_at.desc()),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -53,15 +58,26 @@ class Message(Base):
 
     conversation = relationship("Conversation", back_populates="messages")
 
+    # Backs Conversation.messages (filtered by conversation, ordered by time);
+    # also serves plain conversation_id lookups, so that column has no own index
+    __table_args__ = (
+        Index("messages_conv_ctime_idx", "conversation_id", "created_at"),
+    )
+
 
 # NEW: store uploaded docs
 class Document(Base):
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    conversation_id = Column(
+        Integer, ForeignKey("conversations.id"), nullable=False, index=True
+    )
     filename = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # "pending" while the upload is processed in the background, then "ready" or "failed"
+    status = Column(String, nullable=False, server_default="ready")
+    error = Column(Text, nullable=True)
 
     conversation = relationship("Conversation", back_populates="documents")
     chunks = relationship(
@@ -77,8 +93,11 @@ class DocumentChunk(Base):
     __tablename__ = "document_chunks"
 
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
     chunk_index = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
+    # Sorted, space-separated unique tokens of `content` (see token_key),
+    # precomputed at upload so retrieval doesn't re-tokenize every chunk.
+    token_set = Column(Text, nullable=True)
 
     document = relationship("Document", back_populates="chunks")
@@ -0,0 +1,13 @@
+
+from typing import List
+
+from PyPDF2 import PdfReader
+
+
+# Lives outside routers/conversations.py because spawned extraction workers
+# import it to unpickle their task; it pulls in nothing but PyPDF2 (no
+# FastAPI app, DB engine or HTTP client).
+def extract_page_range(filepath: str, start: int, stop: int) -> List[str]:
+    """Stripped text of pages [start, stop). Runs in a worker process."""
+    reader = PdfReader(filepath)
+    return [(reader.pages[i].extract_text() or "").strip() for i in range(start, stop)]
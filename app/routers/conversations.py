@@ -1,8 +1,14 @@
 
-from typing import List
+import asyncio
+import heapq
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AbstractSet, Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
     HTTPException,
     Query,
@@ -10,16 +16,33 @@ from fastapi import (
     UploadFile,
     File,
 )
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
 
 from .. import models, schemas
-from ..database import get_db
+from ..database import SessionLocal, get_db
 from ..llm_client import call_llm
+from ..pdf_extract import extract_page_range
 
 from PyPDF2 import PdfReader
+import logging
+import multiprocessing
 import os
 import re
+import shutil
+import tempfile
+import threading
+import time
 
+try:
+    import numpy as np
+except ImportError:  # retrieval falls back to a pure-Python scan
+    np = None
+
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/conversations",
@@ -28,29 +51,89 @@ router = APIRouter(
 
 MAX_HISTORY_MESSAGES = 10  # sliding window size
 UPLOAD_DIR = "uploaded_docs"
+MAX_CACHED_INDEXES = 64  # conversations whose ChunkIndex is kept in memory
+MAX_CACHED_RETRIEVALS = 512
+MAX_CACHED_MODES = 10_000
+CONV_MODE_TTL = 300  # seconds; bounds staleness across worker processes
+MAX_BATCH_MESSAGES = 20
+# OCR fallback for scanned PDFs (needs ocrmypdf + tesseract)
+OCR_ENABLED = os.getenv("ENABLE_OCR", "false").lower() in ("1", "true", "yes")
+OCR_MIN_CHARS = 200  # text-layer output shorter than this triggers OCR
+PARALLEL_MIN_PAGES = 8  # smaller PDFs are extracted in-process
+MAX_EXTRACT_WORKERS = 4
+
+_WORD_RE = re.compile(r"[a-z]+")  # applied to lowercased text
+
+# conversation_id -> (mode, expires_at), least recently used first
+_conv_modes: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+
+# Chunk caches are keyed on chunks_version(), read from the DB per query, so
+# chunks stored by any worker process are seen on the next question.
+ChunksVersion = Tuple[int, int]
+
+# conversation_id -> (chunks_version, ChunkIndex), least recently used first
+_chunk_indexes: "OrderedDict[int, Tuple[ChunksVersion, ChunkIndex]]" = OrderedDict()
+
+# (conversation_id, chunks_version, token_key(query), top_k) -> best chunks,
+# least recently used first
+RetrievalKey = Tuple[int, ChunksVersion, str, int]
+_retrieval_cache: "OrderedDict[RetrievalKey, Tuple[str, ...]]" = OrderedDict()
+
+# Worker processes for PDF text extraction (see _get_extract_pool)
+_EXTRACT_WORKERS = min(MAX_EXTRACT_WORKERS, os.cpu_count() or 1)
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()  # callers run in threadpool threads
 
 
 # Helper functions
 
 
-def get_or_create_user(db: Session, user_id: int) -> models.User:
+async def get_or_create_user(db: AsyncSession, user_id: int) -> models.User:
     """
     For simplicity:
     - if user with given id exists -> return it
     - else create a new user with this id and default name
+    A new user is flushed (so later INSERTs can reference it) but not
+    committed; the caller commits.
     """
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if user:
         return user
 
     
     user = models.User(id=user_id, name=f"user-{user_id}")
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.flush()
     return user
 
 
+def remember_conversation_mode(conversation_id: int, mode: str) -> None:
+    _conv_modes[conversation_id] = (mode, time.monotonic() + CONV_MODE_TTL)
+    _conv_modes.move_to_end(conversation_id)
+    if len(_conv_modes) > MAX_CACHED_MODES:
+        _conv_modes.popitem(last=False)
+
+
+async def get_conversation_mode(db: AsyncSession, conversation_id: int) -> Optional[str]:
+    """
+    Mode of a conversation ('open' / 'rag'), or None if it doesn't exist.
+    Recently seen conversations are answered from a per-process cache
+    (entries expire after CONV_MODE_TTL seconds) instead of a SELECT.
+    """
+    cached = _conv_modes.get(conversation_id)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+
+    conversation = await db.get(models.Conversation, conversation_id)
+    if not conversation:
+        _conv_modes.pop(conversation_id, None)
+        return None
+
+    mode = conversation.mode or "open"
+    remember_conversation_mode(conversation_id, mode)
+    return mode
+
+
 def build_llm_history(messages: List[models.Message]) -> List[dict]:
     """
     Convert DB messages -> LLM messages.
@@ -60,6 +143,22 @@ def build_llm_history(messages: List[models.Message]) -> List[dict]:
     return [{"role": m.role, "content": m.content} for m in last]
 
 
+async def _recent_messages(
+    db: AsyncSession, conversation_id: int, n: int
+) -> List[models.Message]:
+    """
+    Last `n` messages of a conversation, oldest first.
+    Only those rows are read, however long the conversation is.
+    """
+    result = await db.execute(
+        select(models.Message)
+        .where(models.Message.conversation_id == conversation_id)
+        .order_by(models.Message.created_at.desc(), models.Message.id.desc())
+        .limit(n)
+    )
+    return list(reversed(result.scalars().all()))
+
+
 # RAG helpers 
 
 
@@ -74,7 +173,6 @@ def chunk_text(text: str, max_chars: int = 800, overlap: int = 200) -> List[str]
     if len(text) > 200_000:
         raise ValueError("Text too large — chunking aborted")
 
-    chunks: List[str] = []
     text_len = len(text)
 
     # step must be positive
@@ -82,15 +180,11 @@ def chunk_text(text: str, max_chars: int = 800, overlap: int = 200) -> List[str]
     if step <= 0:
         step = max_chars
 
-    start = 0
-    while start < text_len:
-        end = min(start + max_chars, text_len)
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        start += step
-
-    return chunks
+    return [
+        chunk
+        for start in range(0, text_len, step)
+        if (chunk := text[start:start + max_chars].strip())
+    ]
 
 
 def normalize(text: str) -> List[str]:
@@ -98,18 +192,22 @@ def normalize(text: str) -> List[str]:
     Very simple tokenizer: lowercase + keep only alphabetic tokens.
     Used for naive keyword-based similarity.
     """
-    text = text.lower()
-    words = re.findall(r"[a-zA-Z]+", text)
-    return words
+    return _WORD_RE.findall(text.lower())
 
 
-def simple_similarity(query: str, chunk: str) -> float:
+def token_key(text: str) -> str:
+    """
+    Unique tokens of `text`, sorted and space-joined.
+    Stored per chunk (DocumentChunk.token_set) at upload time.
+    """
+    return " ".join(sorted(set(normalize(text))))
+
+
+def simple_similarity(q_words: AbstractSet[str], c_words: AbstractSet[str]) -> float:
     """
     Compute simple Jaccard similarity between query words and chunk words.
     This is NOT real embeddings, but good enough to demonstrate retrieval.
     """
-    q_words = set(normalize(query))
-    c_words = set(normalize(chunk))
     if not q_words or not c_words:
         return 0.0
 
@@ -118,29 +216,189 @@ def simple_similarity(query: str, chunk: str) -> float:
     return inter / union
 
 
-def retrieve_relevant_chunks(
-    db: Session, conversation_id: int, query: str, top_k: int = 3
-) -> List[str]:
+def _popcount_rows(words: "np.ndarray") -> "np.ndarray":
+    """Number of set bits in each row of a uint64 matrix."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(words).sum(axis=1)
+    return np.unpackbits(words.view(np.uint8), axis=1).sum(axis=1)
+
+
+class ChunkIndex:
     """
-    Retrieve the most relevant chunks for a conversation using simple keyword similarity.
+    In-memory retrieval index over all chunks of one conversation.
+    With NumPy available, token sets are packed into a
+    (num_chunks, ceil(vocab / 64)) uint64 bitmap so a query is scored
+    against every chunk with vectorized bitwise ops.
+    Without NumPy, falls back to a plain Python scan over the token sets.
+    """
+
+    def __init__(self, contents: List[str], token_sets: List[FrozenSet[str]]):
+        self.contents = contents
+        self.token_sets = token_sets
+        self.vocab: Dict[str, int] = {}
+        self.bitmap = None
+        self.sizes = None
+        if np is not None and contents:  # np.stack needs at least one row
+            self._build_bitmap()
+
+    def _build_bitmap(self) -> None:
+        for words in self.token_sets:
+            for word in words:
+                self.vocab.setdefault(word, len(self.vocab))
+
+        self.bitmap = np.stack([self._encode(words) for words in self.token_sets])
+        self.sizes = np.array([len(words) for words in self.token_sets])
+
+    def _encode(self, words: AbstractSet[str]) -> "np.ndarray":
+        """Pack the in-vocabulary `words` into one bitmap row."""
+        num_bits = max(1, -(-len(self.vocab) // 64)) * 64
+        bits = np.zeros(num_bits, dtype=bool)
+        bits[[self.vocab[w] for w in words if w in self.vocab]] = True
+        return np.packbits(bits, bitorder="little").view(np.uint64)
+
+    def _rank_exact(
+        self, q_words: AbstractSet[str], positions: Iterable[int], top_k: int
+    ) -> List[str]:
+        """
+        Exact Jaccard top-k over `positions` (pure Python).
+        Jaccard(A, B) <= min(|A|, |B|) / max(|A|, |B|), so chunks are visited
+        in decreasing order of that bound and the scan stops once the bound
+        can't beat the current k-th best score.
+        """
+        q_len = len(q_words)
+        if not q_len or top_k <= 0:
+            return []
+
+        def upper_bound(i: int) -> float:
+            c_len = len(self.token_sets[i])
+            return min(q_len, c_len) / max(q_len, c_len)
+
+        # (score, -position) min-heap: ties keep the earlier chunk
+        best: List[Tuple[float, int]] = []
+        for i in sorted(positions, key=upper_bound, reverse=True):
+            if len(best) == top_k and upper_bound(i) < best[0][0]:
+                break
+            item = (simple_similarity(q_words, self.token_sets[i]), -i)
+            if len(best) < top_k:
+                heapq.heappush(best, item)
+            else:
+                heapq.heappushpop(best, item)
+
+        best.sort(reverse=True)
+        return [self.contents[-neg_i] for score, neg_i in best if score > 0]
+
+    def top_k(self, q_words: AbstractSet[str], top_k: int) -> List[str]:
+        """Best `top_k` chunks by Jaccard similarity (score > 0 only)."""
+        if self.bitmap is None:
+            return self._rank_exact(q_words, range(len(self.contents)), top_k)
+
+        inter = _popcount_rows(self.bitmap & self._encode(q_words))
+        # |A ∪ B| = |A| + |B| - |A ∩ B|; query words outside the vocab still count
+        union = self.sizes + len(q_words) - inter
+        scores = np.divide(
+            inter, union, out=np.zeros(len(inter), dtype=float), where=union > 0
+        )
+
+        if len(scores) > top_k:
+            # every chunk tied with the k-th best score, so ties resolve
+            # the same way as in _rank_exact
+            kth = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            best = np.flatnonzero(scores >= kth)
+        else:
+            best = np.arange(len(scores))
+        # highest score first, ties in storage order
+        best = best[np.lexsort((best, -scores[best]))][:top_k]
+        return [self.contents[i] for i in best if scores[i] > 0]
+
+
+async def chunks_version(db: AsyncSession, conversation_id: int) -> ChunksVersion:
     """
-    chunks = (
-        db.query(models.DocumentChunk)
+    (number of chunks, highest chunk id) of a conversation's documents.
+    Changes whenever chunks are added or removed, whichever process did it;
+    a single aggregate over the indexed foreign keys.
+    """
+    result = await db.execute(
+        select(func.count(models.DocumentChunk.id), func.max(models.DocumentChunk.id))
         .join(models.Document)
-        .filter(models.Document.conversation_id == conversation_id)
-        .all()
+        .where(models.Document.conversation_id == conversation_id)
     )
+    count, max_id = result.one()
+    return count, max_id or 0
 
-    if not chunks:
-        return []
 
-    scored = [
-        (simple_similarity(query, ch.content), ch.content)
-        for ch in chunks
+async def get_chunk_index(
+    db: AsyncSession, conversation_id: int, version: ChunksVersion
+) -> ChunkIndex:
+    """
+    Return the cached ChunkIndex for a conversation, building it on a miss.
+    A cached index built for another `version` (see chunks_version) is stale
+    and gets rebuilt.
+    """
+    cached = _chunk_indexes.get(conversation_id)
+    if cached is not None and cached[0] == version:
+        _chunk_indexes.move_to_end(conversation_id)
+        return cached[1]
+
+    # Read after `version`, so the index is never older than its key
+    result = await db.execute(
+        select(
+            models.DocumentChunk.content,
+            models.DocumentChunk.token_set,
+        )
+        .join(models.Document)
+        .where(models.Document.conversation_id == conversation_id)
+        .order_by(models.DocumentChunk.id)
+    )
+    rows = result.all()
+    contents = [content for content, _ in rows]
+    token_sets = [
+        # Chunks stored before token_set existed are tokenized on the fly
+        frozenset(token_set.split() if token_set is not None else normalize(content))
+        for content, token_set in rows
     ]
-    scored.sort(key=lambda x: x[0], reverse=True)
+    index = ChunkIndex(contents, token_sets)
+
+    _chunk_indexes[conversation_id] = (version, index)
+    _chunk_indexes.move_to_end(conversation_id)
+    if len(_chunk_indexes) > MAX_CACHED_INDEXES:
+        _chunk_indexes.popitem(last=False)
+    return index
+
+
+def invalidate_chunk_index(conversation_id: int) -> None:
+    """
+    Drop the cached ChunkIndex and retrieval results of a conversation.
+    Only frees memory early: stale entries are never served (their
+    chunks_version no longer matches).
+    """
+    _chunk_indexes.pop(conversation_id, None)
+    stale = [key for key in _retrieval_cache if key[0] == conversation_id]
+    for key in stale:
+        del _retrieval_cache[key]
 
-    best = [c for score, c in scored[:top_k] if score > 0]
+
+async def retrieve_relevant_chunks(
+    db: AsyncSession, conversation_id: int, query: str, top_k: int = 3
+) -> List[str]:
+    """
+    Retrieve the most relevant chunks for a conversation using simple keyword similarity.
+    Results are cached per (conversation, chunks_version, query tokens), so
+    repeated or reworded-but-same-words questions skip scoring entirely.
+    """
+    version = await chunks_version(db, conversation_id)
+    qkey = token_key(query)
+    cache_key = (conversation_id, version, qkey, top_k)
+    cached = _retrieval_cache.get(cache_key)
+    if cached is not None:
+        _retrieval_cache.move_to_end(cache_key)
+        return list(cached)
+
+    index = await get_chunk_index(db, conversation_id, version)
+    best = index.top_k(frozenset(qkey.split()), top_k) if index.contents else []
+
+    _retrieval_cache[cache_key] = tuple(best)
+    if len(_retrieval_cache) > MAX_CACHED_RETRIEVALS:
+        _retrieval_cache.popitem(last=False)
     return best
 
 
@@ -163,6 +421,162 @@ def build_rag_prompt(context_chunks: List[str], user_message: str) -> List[dict]
     ]
 
 
+# Document ingestion
+
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    # Created on first use and reused, so worker start-up is paid once
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extract_pool
+
+
+def shutdown_extract_pool() -> None:
+    """Stop the extraction workers, if any were started. Called on app shutdown."""
+    global _extract_pool
+    with _extract_pool_lock:
+        pool, _extract_pool = _extract_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _extract_text_layer(filepath: str) -> str:
+    """
+    Text already embedded in the PDF (fast, no OCR).
+    Larger PDFs are split into page ranges extracted in parallel worker
+    processes: PyPDF2 is pure Python, so threads wouldn't overlap.
+    """
+    reader = PdfReader(filepath)
+    num_pages = len(reader.pages)
+
+    if num_pages < PARALLEL_MIN_PAGES or _EXTRACT_WORKERS < 2:
+        texts = [(page.extract_text() or "").strip() for page in reader.pages]
+    else:
+        step = -(-num_pages // _EXTRACT_WORKERS)
+        starts = range(0, num_pages, step)
+        stops = [min(start + step, num_pages) for start in starts]
+        parts = _get_extract_pool().map(
+            extract_page_range, [filepath] * len(starts), starts, stops
+        )
+        texts = [text for part in parts for text in part]
+
+    # Ignore tiny/noise pages
+    return "\n\n".join(text for text in texts if len(text) >= 10)
+
+
+def _ocr_extract(filepath: str) -> str:
+    """
+    OCR a scanned PDF with ocrmypdf and read back the text layer it adds.
+    Needs `pip install ocrmypdf` plus the tesseract binary; only used when
+    ENABLE_OCR is set.
+    """
+    import ocrmypdf
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ocr_path = os.path.join(tmp_dir, "ocr.pdf")
+        # skip_text: pages that already have text are copied as-is
+        ocrmypdf.ocr(filepath, ocr_path, skip_text=True, progress_bar=False)
+        return _extract_text_layer(ocr_path)
+
+
+def extract_pdf_chunks(filepath: str) -> List[str]:
+    """
+    Extract text from a saved PDF and split it into chunks.
+    Tries the PDF's own text layer first and falls back to OCR (if enabled)
+    only when that yields almost nothing, e.g. for scanned documents.
+    Raises ValueError with a user-facing message if the PDF can't be used.
+    """
+    # Extract text from PDF
+    try:
+        full_text = _extract_text_layer(filepath)
+    except Exception as e:
+        raise ValueError(f"Failed to read PDF: {e}")
+
+    if OCR_ENABLED and len(full_text) < OCR_MIN_CHARS:
+        # OCR is best-effort: keep whatever the text layer gave if it fails
+        try:
+            full_text = _ocr_extract(filepath) or full_text
+        except Exception:
+            logger.exception("OCR failed for %s, using the text layer", filepath)
+
+    if not full_text.strip():
+        raise ValueError("No text found in document")
+
+    # Safety: limit size to prevent MemoryError
+    if len(full_text) > 200_000:
+        raise ValueError(
+            "PDF too large. Please upload a smaller document (around 1–5 pages)."
+        )
+
+    # Chunk the text (with internal safety)
+    try:
+        return chunk_text(full_text, max_chars=800, overlap=200)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Chunking failed: {e}")
+
+
+async def _process_pdf(document_id: int, filepath: str) -> None:
+    """
+    Background task for upload_document: chunk the PDF, store the chunks and
+    mark the document 'ready' (or 'failed' with an error message).
+    Runs after the response is sent, so it uses its own DB session.
+    """
+    async with SessionLocal() as db:
+        doc = await db.get(models.Document, document_id)
+        if not doc:
+            return  # conversation was deleted meanwhile
+
+        try:
+            # PDF parsing is CPU-bound: keep it off the event loop
+            chunks = await run_in_threadpool(extract_pdf_chunks, filepath)
+            token_keys = [token_key(ch) for ch in chunks]
+
+            # One executemany instead of an ORM object per chunk
+            await db.execute(
+                insert(models.DocumentChunk),
+                [
+                    {
+                        "document_id": doc.id,
+                        "chunk_index": idx,
+                        "content": ch,
+                        "token_set": key,
+                    }
+                    for idx, (ch, key) in enumerate(zip(chunks, token_keys))
+                ],
+            )
+            doc.status = "ready"
+            await db.commit()
+        except Exception as e:
+            # Never leave the document 'pending': record why it failed
+            await db.rollback()
+            if isinstance(e, ValueError):  # user-facing extraction error
+                error = str(e)
+            else:
+                logger.exception("Processing document %s failed", document_id)
+                error = f"Failed to process document: {e}"
+            await db.execute(
+                update(models.Document)
+                .where(models.Document.id == document_id)
+                .values(status="failed", error=error)
+            )
+            await db.commit()
+            return
+
+        invalidate_chunk_index(doc.conversation_id)
+
+
+def _save_upload(src, filepath: str) -> None:
+    with open(filepath, "wb") as f:
+        shutil.copyfileobj(src, f, 64 * 1024)  # stream, don't buffer the whole upload
+
+
 
 # API endpoints
 
@@ -173,17 +587,14 @@ def build_rag_prompt(context_chunks: List[str], user_message: str) -> List[dict]
     response_model=schemas.ConversationDetail,
     status_code=status.HTTP_201_CREATED,
 )
-def create_conversation(
+async def create_conversation(
     payload: schemas.ConversationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Start a new conversation with the first user message.
     Supports mode = 'open' or 'rag' (RAG needs documents to be uploaded later).
     """
-    # Ensure user exists (or create)
-    user = get_or_create_user(db, payload.user_id)
-
     # Determine mode: "open" (default) or "rag"
     mode = payload.mode or "open"
     if mode not in ("open", "rag"):
@@ -192,66 +603,76 @@ def create_conversation(
             detail="mode must be 'open' or 'rag'",
         )
 
-    # Create conversation
-    conversation = models.Conversation(user_id=user.id, mode=mode)
-    db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
-
     # First user message
-    user_msg = models.Message(
-        conversation_id=conversation.id,
-        role="user",
-        content=payload.first_message,
-    )
-    db.add(user_msg)
-    db.commit()
-    db.refresh(user_msg)
+    user_msg = {
+        "role": "user",
+        "content": payload.first_message,
+        "created_at": datetime.utcnow(),  # time received, not time stored
+    }
 
     # For first reply, we use normal sliding window logic.
-    history = build_llm_history([user_msg])
+    # The LLM is called before anything is written, so no SQLite write
+    # transaction is held open during the round-trip.
+    history = build_llm_history([models.Message(**user_msg)])
     try:
-        assistant_text = call_llm(history)
+        assistant_text = await call_llm(history)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to call LLM: {e}",
         )
 
-    assistant_msg = models.Message(
-        conversation_id=conversation.id,
-        role="assistant",
-        content=assistant_text,
-    )
-    db.add(assistant_msg)
-    db.commit()
-    db.refresh(assistant_msg)
+    assistant_msg = {"role": "assistant", "content": assistant_text}
 
-    db.refresh(conversation)  # to load messages
-    return conversation
+    # Ensure user exists (or create), then store everything in one transaction.
+    # INSERT ... RETURNING hands back ids/defaults without a refresh SELECT.
+    user = await get_or_create_user(db, payload.user_id)
+    result = await db.execute(
+        insert(models.Conversation)
+        .values(user_id=user.id, mode=mode)
+        .returning(models.Conversation.id, models.Conversation.created_at)
+    )
+    conversation_id, created_at = result.one()
+
+    result = await db.scalars(
+        insert(models.Message).returning(models.Message, sort_by_parameter_order=True),
+        [
+            {**user_msg, "conversation_id": conversation_id},
+            {**assistant_msg, "conversation_id": conversation_id},
+        ],
+    )
+    messages = result.all()
+    await db.commit()
+    remember_conversation_mode(conversation_id, mode)
+
+    return schemas.ConversationDetail(
+        id=conversation_id,
+        user_id=user.id,
+        created_at=created_at,
+        mode=mode,
+        messages=messages,
+    )
 
 
 @router.post(
     "/{conversation_id}/documents",
     response_model=schemas.DocumentUploadResult,
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
 )
-def upload_document(
+async def upload_document(
     conversation_id: int,
+    background: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Upload a document (text-based PDF) and attach it to a conversation.
-    The text is extracted, chunked, and stored for later RAG use.
+    The file is saved and a 'pending' document is returned right away;
+    text extraction, chunking and storage run in the background.
+    Poll GET /conversations/{id}/documents/{document_id} for the status.
     Designed for small PDFs (1-5 pages).
     """
-    conversation = (
-        db.query(models.Conversation)
-        .filter(models.Conversation.id == conversation_id)
-        .first()
-    )
-    if not conversation:
+    if await get_conversation_mode(db, conversation_id) is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
     if file.content_type != "application/pdf":
@@ -260,117 +681,107 @@ def upload_document(
     # Ensure upload directory exists
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-    # Save file to disk
-    filepath = os.path.join(UPLOAD_DIR, f"conv{conversation_id}_{file.filename}")
-    with open(filepath, "wb") as f:
-        f.write(file.file.read())
-
-    # Extract text from PDF
-    try:
-        reader = PdfReader(filepath)
-        full_text_parts: List[str] = []
-
-        for page in reader.pages:
-            text = page.extract_text()
-            if not text:
-                continue
-            text = text.strip()
-            # Ignore tiny/noise pages
-            if len(text) < 10:
-                continue
-            full_text_parts.append(text)
-
-        full_text = "\n\n".join(full_text_parts)
+    doc = models.Document(
+        conversation_id=conversation_id,
+        filename=file.filename,
+        status="pending",
+    )
+    db.add(doc)
+    await db.flush()  # assigns doc.id
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to read PDF: {e}")
+    # Save file to disk under a per-document name: a re-upload of the same
+    # filename must not overwrite a file whose background job is still reading it
+    filepath = os.path.join(
+        UPLOAD_DIR, f"conv{conversation_id}_doc{doc.id}_{file.filename}"
+    )
+    await run_in_threadpool(_save_upload, file.file, filepath)
+    await db.commit()
 
-    if not full_text.strip():
-        raise HTTPException(status_code=400, detail="No text found in document")
+    background.add_task(_process_pdf, doc.id, filepath)
 
-    # Safety: limit size to prevent MemoryError
-    if len(full_text) > 200_000:
-        raise HTTPException(
-            status_code=400,
-            detail="PDF too large. Please upload a smaller document (around 1–5 pages).",
-        )
+    return schemas.DocumentUploadResult(document_id=doc.id, status=doc.status)
 
-    # Chunk the text (with internal safety)
-    try:
-        chunks = chunk_text(full_text, max_chars=800, overlap=200)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Chunking failed: {e}")
 
-    # Store document + chunks
-    doc = models.Document(
-        conversation_id=conversation.id,
-        filename=file.filename,
-    )
-    db.add(doc)
-    db.commit()
-    db.refresh(doc)
-
-    for idx, ch in enumerate(chunks):
-        db.add(
-            models.DocumentChunk(
-                document_id=doc.id,
-                chunk_index=idx,
-                content=ch,
+@router.get(
+    "/{conversation_id}/documents/{document_id}",
+    response_model=schemas.DocumentUploadResult,
+)
+async def get_document_status(
+    conversation_id: int,
+    document_id: int,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Processing status of an uploaded document: 'pending', 'ready' or 'failed'.
+    """
+    doc = await db.get(models.Document, document_id)
+    if not doc or doc.conversation_id != conversation_id:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    num_chunks = None
+    if doc.status == "ready":
+        num_chunks = await db.scalar(
+            select(func.count(models.DocumentChunk.id)).where(
+                models.DocumentChunk.document_id == doc.id
             )
         )
-    db.commit()
 
     return schemas.DocumentUploadResult(
         document_id=doc.id,
-        num_chunks=len(chunks),
+        status=doc.status,
+        num_chunks=num_chunks,
+        error=doc.error,
     )
 
 
 @router.get("", response_model=List[schemas.ConversationSummary])
-def list_conversations(
+async def list_conversations(
     user_id: int = Query(..., description="User ID to list conversations for"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     List all conversations for a given user.
     """
-    conversations = (
-        db.query(models.Conversation)
-        .filter(models.Conversation.user_id == user_id)
+    result = await db.execute(
+        select(models.Conversation)
+        # only the columns ConversationSummary needs
+        .options(
+            load_only(
+                models.Conversation.id,
+                models.Conversation.created_at,
+                models.Conversation.title,
+            )
+        )
+        .where(models.Conversation.user_id == user_id)
         .order_by(models.Conversation.created_at.desc())
-        .all()
     )
-    return conversations
+    return result.scalars().all()
 
 
 @router.get("/{conversation_id}", response_model=schemas.ConversationDetail)
-def get_conversation(
+async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get a conversation with full message history.
     """
-    conversation = (
-        db.query(models.Conversation)
-        .filter(models.Conversation.id == conversation_id)
-        .first()
+    result = await db.execute(
+        select(models.Conversation)
+        .options(selectinload(models.Conversation.messages))
+        .where(models.Conversation.id == conversation_id)
     )
+    conversation = result.scalar_one_or_none()
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
 
 
-@router.post("/{conversation_id}/messages", response_model=schemas.AssistantReply)
-def add_message(
-    conversation_id: int,
-    payload: schemas.MessageCreate,
-    db: Session = Depends(get_db),
-):
+async def _prepare_turn(
+    db: AsyncSession, conversation_id: int, content: str
+) -> Tuple[models.Message, List[dict]]:
     """
-    Add a new user message to an existing conversation.
+    Build the (unsaved) user message and the LLM prompt for one turn.
 
     If conversation.mode == 'rag':
         - Retrieve relevant document chunks
@@ -378,40 +789,103 @@ def add_message(
     Else:
         - Use normal sliding window conversation history.
     """
-    conversation = (
-        db.query(models.Conversation)
-        .filter(models.Conversation.id == conversation_id)
-        .first()
-    )
-    if not conversation:
+    mode = await get_conversation_mode(db, conversation_id)
+    if mode is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Store user message
     user_msg = models.Message(
-        conversation_id=conversation.id,
+        conversation_id=conversation_id,
         role="user",
-        content=payload.content,
+        content=content,
+        created_at=datetime.utcnow(),  # time received, not time stored
     )
-    db.add(user_msg)
-    db.commit()
-    db.refresh(user_msg)
 
-    db.refresh(conversation)  # ensures .messages and .mode are up-to-date
+    if mode == "rag":
+        # RAG flow
+        context_chunks = await retrieve_relevant_chunks(
+            db, conversation_id=conversation_id, query=content, top_k=3
+        )
+        messages = build_rag_prompt(context_chunks, content)
+    else:
+        # Open chat flow (no extra context); history is only needed here
+        recent = await _recent_messages(db, conversation_id, MAX_HISTORY_MESSAGES - 1)
+        messages = build_llm_history(recent + [user_msg])
+
+    return user_msg, messages
+
+
+@router.post("/batch_messages", response_model=schemas.BatchReply)
+async def add_messages_batch(
+    payload: schemas.BatchMessagesCreate,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Add one user message to each of several conversations in one call.
+    Prompts are built first, then all LLM calls run concurrently (paced by
+    the shared rate limiter in llm_client). All messages are stored in a
+    single transaction; if any LLM call fails, nothing is stored.
+    Messages for the same conversation don't see each other in their history.
+    """
+    if len(payload.messages) > MAX_BATCH_MESSAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_MESSAGES} messages per batch",
+        )
 
     try:
-        if conversation.mode == "rag":
-            # RAG flow
-            context_chunks = retrieve_relevant_chunks(
-                db, conversation_id=conversation.id, query=payload.content, top_k=3
-            )
-            messages = build_rag_prompt(context_chunks, payload.content)
-        else:
-            # Open chat flow (no extra context)
-            history = build_llm_history(conversation.messages)
-            messages = history
+        # The session can't be shared by concurrent tasks: DB reads stay sequential
+        turns = [
+            await _prepare_turn(db, item.conversation_id, item.content)
+            for item in payload.messages
+        ]
+        assistant_texts = await asyncio.gather(
+            *(call_llm(messages) for _, messages in turns)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to call LLM: {e}",
+        )
+
+    replies = []
+    for (user_msg, _), assistant_text in zip(turns, assistant_texts):
+        assistant_msg = models.Message(
+            conversation_id=user_msg.conversation_id,
+            role="assistant",
+            content=assistant_text,
+        )
+        db.add_all([user_msg, assistant_msg])
+        replies.append(assistant_msg)
+    await db.commit()
+
+    return schemas.BatchReply(
+        replies=[schemas.AssistantReply(assistant_message=m) for m in replies]
+    )
+
+
+@router.post("/{conversation_id}/messages", response_model=schemas.AssistantReply)
+async def add_message(
+    conversation_id: int,
+    payload: schemas.MessageCreate,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Add a new user message to an existing conversation.
 
-        assistant_text = call_llm(messages)
+    If conversation.mode == 'rag':
+        - Retrieve relevant document chunks
+        - Build a RAG prompt
+    Else:
+        - Use normal sliding window conversation history.
+    """
+    try:
+        user_msg, messages = await _prepare_turn(db, conversation_id, payload.content)
+        assistant_text = await call_llm(messages)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -419,33 +893,32 @@ def add_message(
         )
 
     assistant_msg = models.Message(
-        conversation_id=conversation.id,
+        conversation_id=conversation_id,
         role="assistant",
         content=assistant_text,
     )
-    db.add(assistant_msg)
-    db.commit()
-    db.refresh(assistant_msg)
+    # Both messages in one transaction, written after the LLM call so no
+    # write lock is held during it
+    db.add_all([user_msg, assistant_msg])
+    await db.commit()
 
     return schemas.AssistantReply(assistant_message=assistant_msg)
 
 
 @router.delete("/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Delete a conversation and all its messages + documents + chunks.
     """
-    conversation = (
-        db.query(models.Conversation)
-        .filter(models.Conversation.id == conversation_id)
-        .first()
-    )
+    conversation = await db.get(models.Conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    db.delete(conversation)
-    db.commit()
+    await db.delete(conversation)
+    await db.commit()
+    invalidate_chunk_index(conversation_id)
+    _conv_modes.pop(conversation_id, None)
     return
@@ -62,8 +62,22 @@ class AssistantReply(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class BatchMessage(MessageBase):
+    conversation_id: int
+
+
+class BatchMessagesCreate(BaseModel):
+    messages: List[BatchMessage]
+
+
+class BatchReply(BaseModel):
+    replies: List[AssistantReply]
+
+
 #  Document upload 
 
 class DocumentUploadResult(BaseModel):
     document_id: int
-    num_chunks: int
+    status: str  # "pending", "ready" or "failed"
+    num_chunks: Optional[int] = None
+    error: Optional[str] = None